@@ -34,13 +34,17 @@ BG_COLOR = (50, 80, 120)  # dark blue-gray
 # Rect overlay color (white)
 OVERLAY_COLOR = (255, 255, 255)
 
+# Display refresh rate (frames per second) the main loop is paced at
+REFRESH_RATE = 60
+
 ########################
 # Helper functions
 ########################
 
 def get_current_bit(t, bit_duration, bit_string):
     """
-    Given the elapsed time t (seconds), return:
+    Given the elapsed time t (in the same unit as bit_duration,
+    e.g. seconds or frames), return:
       - current bit index (0-based)
       - bit value ('0' or '1')
     If t exceeds the last bit, return (None, None).
@@ -70,6 +74,19 @@ def compute_alpha(t_local, bit_value):
     alpha_norm = max(0.0, min(1.0, alpha_norm))
     return alpha_norm
 
+
+def build_alpha_table(frames_per_bit, refresh_rate):
+    """
+    Precompute the normalized alpha for every frame offset within a bit
+    interval, for both bit values. Returns {'0': [...], '1': [...]} where
+    entry k is compute_alpha(k / refresh_rate, bit_value).
+    """
+    return {
+        bit_value: [compute_alpha(k / refresh_rate, bit_value)
+                    for k in range(frames_per_bit)]
+        for bit_value in ('0', '1')
+    }
+
 ########################
 # Main
 ########################
@@ -80,12 +97,22 @@ def main():
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption("BFSK Alpha Transmitter")
 
-    clock = pygame.time.Clock()
+    # Create a solid overlay surface once; its alpha is changed per frame with
+    # a surface-wide blend constant instead of rewriting every pixel
+    overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    overlay.fill(OVERLAY_COLOR)
 
-    # Create overlay surface with per-pixel alpha enabled
-    overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+    # The loop runs on a fixed frame schedule, so bits are counted in frames
+    frames_per_bit = int(round(BIT_DURATION * REFRESH_RATE))
 
-    start_time = time.time()
+    # Alpha values per frame offset, so no sin() is evaluated per frame
+    alpha_table = build_alpha_table(frames_per_bit, REFRESH_RATE)
+
+    # Font for the bit index/value label
+    font = pygame.font.SysFont(None, 40)
+
+    start_time = time.perf_counter()
+    frame_idx = 0
     running = True
 
     print("Transmitting bit string:", BIT_STRING)
@@ -100,38 +127,39 @@ def main():
             if event.type == pygame.QUIT:
                 running = False
 
-        # Elapsed time since start (seconds)
-        t = time.time() - start_time
-
-        # Determine current bit
-        bit_index, bit_value = get_current_bit(t, BIT_DURATION, BIT_STRING)
+        # Determine current bit from the frame number, not the wall clock
+        bit_index, bit_value = get_current_bit(frame_idx, frames_per_bit, BIT_STRING)
 
         # Stop after all bits are sent
         if bit_index is None:
-            print("Transmission finished.")
+            print(f"Transmission finished in {time.perf_counter() - start_time:.3f} s.")
             running = False
         else:
-            # Time within the current bit interval
-            t_local = t - bit_index * BIT_DURATION
+            # Frame offset within the current bit interval
+            k = frame_idx - bit_index * frames_per_bit
 
-            # Compute alpha
-            alpha_norm = compute_alpha(t_local, bit_value)
+            alpha_norm = alpha_table[bit_value][k]
             alpha_255 = int(alpha_norm * 255)
 
             # Fill background
             screen.fill(BG_COLOR)
 
             # Draw white overlay with computed alpha
-            overlay.fill((OVERLAY_COLOR[0], OVERLAY_COLOR[1], OVERLAY_COLOR[2], alpha_255))
+            overlay.set_alpha(alpha_255)
             screen.blit(overlay, (0, 0))
 
             # Optionally display text (bit index, bit value)
-            font = pygame.font.SysFont(None, 40)
             text_surface = font.render(f"Bit {bit_index+1}/{len(BIT_STRING)}: {bit_value}", True, (255, 255, 255))
             screen.blit(text_surface, (20, 20))
 
             pygame.display.flip()
-            clock.tick(60)  # try to keep ~60 FPS
+
+            # Wait for the next slot on the fixed REFRESH_RATE schedule;
+            # deadlines are absolute, so timing errors do not accumulate
+            frame_idx += 1
+            delay = start_time + frame_idx / REFRESH_RATE - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
 
     pygame.quit()
     sys.exit()